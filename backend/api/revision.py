@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from backend.models.schemas import RevisionRequest, RevisionResponse, TopicResponse
 from backend.core.revision_agents import ProgressiveRevisionAgent
 from backend.core.mongodb_client import MongoDBClient
-from datetime import datetime
+from datetime import datetime, timezone
+import json
 import uuid
 import logging
 
@@ -23,7 +25,7 @@ def set_dependencies(ra: ProgressiveRevisionAgent, mc: MongoDBClient):
 async def get_available_topics():
     """Get all available topics for revision"""
     try:
-        topics = mongodb_client.get_available_topics()
+        topics = await mongodb_client.get_available_topics()
         return TopicResponse(topics=topics)
     except Exception as e:
         logger.error(f"Error fetching topics: {e}")
@@ -50,7 +52,7 @@ async def start_revision_session(request: RevisionRequest):
             is_session_complete=result["is_session_complete"],
             session_summary=result.get("session_summary"),
             sources=result.get("sources", []),
-            timestamp=datetime.now()
+            timestamp=datetime.now(timezone.utc)
         )
         
     except Exception as e:
@@ -75,9 +77,26 @@ async def continue_revision_session(request: RevisionRequest):
             session_summary=result.get("session_summary"),
             next_suggested_action=result.get("next_suggested_action"),
             sources=result.get("sources", []),
-            timestamp=datetime.now()
+            timestamp=datetime.now(timezone.utc)
         )
         
     except Exception as e:
         logger.error(f"Error continuing revision session: {e}")
-        raise HTTPException(status_code=500, detail="Failed to continue revision session")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to continue revision session")
+
+@router.post("/revision/continue/stream")
+async def continue_revision_session_stream(request: RevisionRequest):
+    """Continue an existing revision session, streaming the reply as server-sent events"""
+    
+    async def event_stream():
+        try:
+            async for event in revision_agent.continue_revision_stream(
+                session_id=request.session_id,
+                user_query=request.query
+            ):
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming revision session: {e}")
+            yield f"data: {json.dumps({'type': 'error', 'detail': 'Failed to continue revision session'})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
\ No newline at end of file
@@ -0,0 +1,64 @@
+from cachetools import TTLCache
+from typing import List, Optional, Tuple
+import numpy as np
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class SemanticAnswerCache:
+    """Per-topic cache of answered questions, matched by embedding similarity"""
+    
+    def __init__(self, similarity_threshold: float, max_entries_per_topic: int, ttl_seconds: int, max_topics: int = 512):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_topic = max_entries_per_topic
+        self.ttl_seconds = ttl_seconds
+        # topic -> (unit-normalised embedding matrix, [(answer, sources), ...], per-entry monotonic store times);
+        # the topic-level TTL evicts idle topics, the per-entry times expire answers within busy ones
+        self._topics: TTLCache = TTLCache(maxsize=max_topics, ttl=ttl_seconds)
+    
+    def lookup(self, topic: str, embedding: List[float]) -> Optional[Tuple[str, List[str]]]:
+        """Return the cached answer for the most similar question, if it is similar enough"""
+        entry = self._topics.get(topic)
+        if entry is None:
+            return None
+        
+        matrix, answers, stored_at = entry
+        query = self._normalise(embedding)
+        if query is None or query.shape[0] != matrix.shape[1]:
+            return None
+        
+        # Cosine similarity against every cached question in one product; expired entries never match
+        scores = np.where(stored_at > time.monotonic() - self.ttl_seconds, matrix @ query, -np.inf)
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            logger.info(f"Semantic answer cache hit for topic '{topic}' (similarity {scores[best]:.3f})")
+            return answers[best]
+        return None
+    
+    def store(self, topic: str, embedding: List[float], answer: str, sources: List[str]):
+        """Remember an answer, dropping the oldest entries beyond the per-topic limit"""
+        vector = self._normalise(embedding)
+        if vector is None:
+            return
+        
+        now = time.monotonic()
+        entry = self._topics.get(topic)
+        if entry is None or entry[0].shape[1] != vector.shape[0]:
+            matrix, answers, stored_at = vector[np.newaxis, :], [(answer, sources)], np.array([now])
+        else:
+            # Drop expired entries, then append and keep the newest max_entries_per_topic
+            fresh = np.flatnonzero(entry[2] > now - self.ttl_seconds)
+            matrix = np.vstack([entry[0][fresh], vector])[-self.max_entries_per_topic:]
+            answers = ([entry[1][i] for i in fresh] + [(answer, sources)])[-self.max_entries_per_topic:]
+            stored_at = np.append(entry[2][fresh], now)[-self.max_entries_per_topic:]
+        self._topics[topic] = (matrix, answers, stored_at)
+    
+    @staticmethod
+    def _normalise(embedding: List[float]) -> Optional[np.ndarray]:
+        """Convert an embedding to a unit-length float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if vector.ndim != 1 or norm == 0:
+            return None
+        return vector / norm
\ No newline at end of file
@@ -1,11 +1,21 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain.schema import BaseMessage
-from typing import List, Optional
+import google.generativeai as genai
+from google.generativeai import caching
+from typing import Any, AsyncIterator, Dict, List, Optional
+from datetime import timedelta
+import asyncio
+import json
 import logging
 from backend.config import Config  # Import config directly
 
 logger = logging.getLogger(__name__)
 
+FALLBACK_RESPONSE = "I apologize, but I'm having trouble generating a response right now."
+
+class StreamInterruptedError(Exception):
+    """A response stream failed after part of the text had already been yielded"""
+
 class GeminiLLMWrapper:
     def __init__(self):
         """Initialize with config values directly"""
@@ -15,18 +25,135 @@ class GeminiLLMWrapper:
             temperature=0.3,
             max_output_tokens=2048,
         )
+        # Same model constrained to emit a single JSON document
+        self.json_llm = ChatGoogleGenerativeAI(
+            google_api_key=Config.GEMINI_API_KEY,
+            model=Config.GEMINI_MODEL,
+            temperature=0.3,
+            max_output_tokens=2048,
+            response_mime_type="application/json",
+        )
+        self.embeddings = GoogleGenerativeAIEmbeddings(
+            google_api_key=Config.GEMINI_API_KEY,
+            model=Config.GEMINI_EMBEDDING_MODEL,
+        )
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        self._request_slots = asyncio.Semaphore(Config.GEMINI_MAX_CONCURRENT_REQUESTS)
+    
+    async def create_cached_content(
+        self, 
+        system_instruction: str, 
+        contents: List[str], 
+        ttl_seconds: int
+    ) -> Optional[str]:
+        """Register a reusable context cache and return its name, or None if caching is unavailable"""
+        try:
+            cache = await asyncio.to_thread(
+                caching.CachedContent.create,
+                model=f"models/{Config.GEMINI_MODEL}",
+                system_instruction=system_instruction,
+                contents=contents,
+                ttl=timedelta(seconds=ttl_seconds),
+            )
+            return cache.name
+        except Exception as e:
+            # e.g. content below the model's minimum cacheable token count
+            logger.info(f"Context cache not created, using uncached prompts: {e}")
+            return None
+    
+    async def refresh_cached_content(self, name: str, ttl_seconds: int) -> bool:
+        """Extend the TTL of an existing context cache"""
+        try:
+            cache = await asyncio.to_thread(caching.CachedContent.get, name)
+            await asyncio.to_thread(cache.update, ttl=timedelta(seconds=ttl_seconds))
+            return True
+        except Exception as e:
+            logger.warning(f"Could not refresh context cache {name}: {e}")
+            return False
+    
+    async def delete_cached_content(self, name: str) -> bool:
+        """Delete a context cache before its TTL runs out"""
+        try:
+            cache = await asyncio.to_thread(caching.CachedContent.get, name)
+            await asyncio.to_thread(cache.delete)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not delete context cache {name}: {e}")
+            return False
+    
+    async def embed_query(self, text: str) -> Optional[List[float]]:
+        """Embed a single query, or return None if the embedding call fails"""
+        try:
+            return await self.embeddings.aembed_query(text)
+        except Exception as e:
+            logger.warning(f"Query embedding failed: {e}")
+            return None
     
     async def generate_response(
         self, 
         messages: List[BaseMessage], 
+        cached_content: Optional[str] = None,
         **kwargs
     ) -> str:
         try:
+            if cached_content:
+                kwargs["cached_content"] = cached_content
             response = await self.llm.ainvoke(messages, **kwargs)
             return response.content
         except Exception as e:
             logger.error(f"LLM generation error: {e}")
-            return "I apologize, but I'm having trouble generating a response right now."
+            return FALLBACK_RESPONSE
+    
+    async def generate_json(
+        self, 
+        messages: List[BaseMessage], 
+        cached_content: Optional[str] = None,
+        **kwargs
+    ) -> Optional[Dict[str, Any]]:
+        """Generate a JSON object response, or None if generation or parsing fails"""
+        try:
+            if cached_content:
+                kwargs["cached_content"] = cached_content
+            response = await self.json_llm.ainvoke(messages, **kwargs)
+            data = json.loads(response.content)
+            return data if isinstance(data, dict) else None
+        except Exception as e:
+            logger.error(f"LLM JSON generation error: {e}")
+            return None
+    
+    async def generate_many(
+        self, 
+        message_batches: List[List[BaseMessage]], 
+        cached_content: Optional[str] = None,
+        **kwargs
+    ) -> List[str]:
+        """Run independent prompts concurrently, bounded by the request semaphore; results keep input order"""
+        async def _bounded(messages: List[BaseMessage]) -> str:
+            async with self._request_slots:
+                return await self.generate_response(messages, cached_content=cached_content, **kwargs)
+        
+        return list(await asyncio.gather(*(_bounded(messages) for messages in message_batches)))
+    
+    async def astream_response(
+        self, 
+        messages: List[BaseMessage], 
+        cached_content: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Yield response text incrementally as the model generates it"""
+        streamed = False
+        try:
+            if cached_content:
+                kwargs["cached_content"] = cached_content
+            async for chunk in self.llm.astream(messages, **kwargs):
+                if chunk.content:
+                    streamed = True
+                    yield chunk.content
+        except Exception as e:
+            logger.error(f"LLM streaming error: {e}")
+            if streamed:
+                raise StreamInterruptedError(str(e)) from e
+            yield FALLBACK_RESPONSE
     
     def generate_response_sync(
         self, 
@@ -38,4 +165,4 @@ class GeminiLLMWrapper:
             return response.content
         except Exception as e:
             logger.error(f"LLM generation error: {e}")
-            return "I apologize, but I'm having trouble generating a response right now."
\ No newline at end of file
+            return FALLBACK_RESPONSE
\ No newline at end of file
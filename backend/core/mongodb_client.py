@@ -1,59 +1,162 @@
-from pymongo import MongoClient
-from typing import List, Dict, Any, Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import logging
-from datetime import datetime
+import re
+import threading
+import time
+from datetime import datetime, timezone
 from backend.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Process-wide client so every MongoDBClient shares one connection pool
+_CLIENT: Optional[AsyncIOMotorClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+def _get_client() -> AsyncIOMotorClient:
+    """Create the shared Motor client on first use"""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = AsyncIOMotorClient(
+                    Config.MONGODB_URI,
+                    maxPoolSize=Config.MONGODB_MAX_POOL_SIZE,
+                    minPoolSize=Config.MONGODB_MIN_POOL_SIZE,
+                    maxIdleTimeMS=Config.MONGODB_MAX_IDLE_TIME_MS,
+                    compressors=Config.MONGODB_COMPRESSORS,
+                    # Return stored datetimes as UTC-aware values
+                    tz_aware=True
+                )
+    return _CLIENT
+
+def close_client():
+    """Close the shared Motor client (called on application shutdown)"""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is not None:
+            _CLIENT.close()
+            _CLIENT = None
+
 class MongoDBClient:
     def __init__(self):
-        self.client = MongoClient(Config.MONGODB_URI)
+        self.client = _get_client()
         self.db = self.client[Config.DATABASE_NAME]
         self.collection = self.db[Config.COLLECTION_NAME]
         self.revision_collection = self.db[Config.REVISION_COLLECTION]  # New collection
+        
+        # Topic list is read-mostly, so keep a short-lived copy in memory
+        self._topics_cache: Optional[Tuple[float, List[Dict[str, Any]]]] = None
+        self._topics_cache_lock = asyncio.Lock()
+        
+        # Session updates queued for the write-behind task as (operation, completion future)
+        self._write_queue: asyncio.Queue = asyncio.Queue()
+        self._writer_task: Optional[asyncio.Task] = None
+    
+    async def ensure_indexes(self):
+        """Create the indexes the topic and session queries rely on"""
+        index_specs = [
+            (self.collection, [("topic", 1)], {"name": "topic_idx"}),
+            (self.collection, [("topic", 1), ("text", "text")], {"name": "topic_text_idx"}),
+            (self.revision_collection, [("session_id", 1)], {"name": "session_id_idx"}),
+        ]
+        
+        # A collection allows only one text index, so an older one would block topic_text_idx on every startup
+        await self._drop_conflicting_text_index(self.collection, "topic_text_idx")
+        
+        for collection, keys, options in index_specs:
+            try:
+                await collection.create_index(keys, background=True, **options)
+            except OperationFailure as e:
+                # An equivalent index already exists under another name/options
+                logger.warning(f"Could not create index {options['name']}: {e}")
+    
+    async def _drop_conflicting_text_index(self, collection, keep_name: str):
+        """Drop a text index not named keep_name; $text queries fall back to regex until the rebuild finishes"""
+        indexes = await collection.index_information()
+        for name, info in indexes.items():
+            is_text_index = any(kind == "text" for _, kind in info["key"])
+            if is_text_index and name != keep_name:
+                logger.warning(f"Replacing text index {name} on {collection.name} with {keep_name}")
+                await collection.drop_index(name)
     
-    def get_available_topics(self) -> List[Dict[str, Any]]:
+    def _get_cached_topics(self) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached topic list if it is still fresh"""
+        cached = self._topics_cache
+        if cached and time.monotonic() - cached[0] < Config.TOPICS_CACHE_TTL_SECONDS:
+            return cached[1]
+        return None
+    
+    async def get_available_topics(self) -> List[Dict[str, Any]]:
         """Fetch all available topics from MongoDB"""
+        cached = self._get_cached_topics()
+        if cached is not None:
+            return cached
+        
+        # Concurrent misses wait for a single refresh instead of each querying
+        async with self._topics_cache_lock:
+            cached = self._get_cached_topics()
+            if cached is not None:
+                return cached
+            return await self._load_available_topics()
+    
+    async def _load_available_topics(self) -> List[Dict[str, Any]]:
+        """Aggregate topic chunk counts and refresh the topic cache"""
         try:
-            # Get distinct topics
-            topics = self.collection.distinct("topic")
+            # Count chunks per topic in a single grouped aggregation
+            cursor = self.collection.aggregate(
+                [
+                    {"$group": {"_id": "$topic", "chunk_count": {"$sum": 1}}},
+                    {"$sort": {"_id": 1}}
+                ],
+                allowDiskUse=False,
+                batchSize=256
+            )
             
-            # Get topic details with counts
             topic_details = []
-            for topic in topics:
-                count = self.collection.count_documents({"topic": topic})
+            async for doc in cursor:
+                topic = doc["_id"]
+                count = doc["chunk_count"]
                 
                 # Get dynamic config for this topic
-                topic_config = Config.get_topic_config(topic)
+                max_conversations, completion_threshold = Config.get_topic_limits(topic)
                 
                 topic_details.append({
                     "topic": topic,
                     "chunk_count": count,
                     "description": f"Study material with {count} content sections",
-                    "max_conversations": topic_config["max_conversations"],
-                    "completion_threshold": topic_config["completion_threshold"]
+                    "max_conversations": max_conversations,
+                    "completion_threshold": completion_threshold
                 })
             
+            self._topics_cache = (time.monotonic(), topic_details)
+            
             return topic_details
         except Exception as e:
             logger.error(f"Error fetching topics: {e}")
             return []
     
-    def get_topic_content(self, topic: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def invalidate_topics_cache(self):
+        """Drop the cached topic list so the next call re-reads MongoDB"""
+        self._topics_cache = None
+    
+    async def get_topic_content(self, topic: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get content chunks for a specific topic"""
         try:
             cursor = self.collection.find(
                 {"topic": topic},
                 {"text": 1, "chunk_id": 1, "topic": 1, "_id": 0}
-            ).limit(limit)
+            ).limit(limit).batch_size(limit)
             
-            return list(cursor)
+            return await cursor.to_list(length=limit)
         except Exception as e:
             logger.error(f"Error fetching topic content: {e}")
             return []
     
-    def get_topic_content_chunks(self, topic: str) -> List[Dict[str, Any]]:
+    async def get_topic_content_chunks(self, topic: str) -> List[Dict[str, Any]]:
         """Get all content chunks for progressive learning"""
         try:
             cursor = self.collection.find(
@@ -61,7 +164,7 @@ class MongoDBClient:
                 {"text": 1, "chunk_id": 1, "topic": 1, "_id": 0}
             )
             
-            chunks = list(cursor)
+            chunks = await cursor.to_list(length=None)
             # Split large texts into smaller concept chunks if needed
             concept_chunks = []
             
@@ -98,30 +201,35 @@ class MongoDBClient:
             logger.error(f"Error fetching topic content chunks: {e}")
             return []
     
-    def search_topic_content(self, topic: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    async def search_topic_content(self, topic: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """Search within topic content using text search"""
         try:
-            # Simple text search within topic
-            cursor = self.collection.find(
-                {
-                    "topic": topic,
-                    "$text": {"$search": query}
-                },
-                {"text": 1, "chunk_id": 1, "topic": 1, "score": {"$meta": "textScore"}}
-            ).sort([("score", {"$meta": "textScore"})]).limit(limit)
-            
-            results = list(cursor)
+            results = []
+            try:
+                # Simple text search within topic
+                cursor = self.collection.find(
+                    {
+                        "topic": topic,
+                        "$text": {"$search": query}
+                    },
+                    {"text": 1, "chunk_id": 1, "topic": 1, "_id": 0, "score": {"$meta": "textScore"}}
+                ).sort([("score", {"$meta": "textScore"})]).limit(limit).batch_size(limit)
+                
+                results = await cursor.to_list(length=limit)
+            except OperationFailure as e:
+                # No usable text index - go straight to the regex fallback
+                logger.warning(f"Text search unavailable, using regex fallback: {e}")
             
             # If no text search results, fall back to regex search
             if not results:
                 cursor = self.collection.find(
                     {
                         "topic": topic,
-                        "text": {"$regex": query, "$options": "i"}
+                        "text": {"$regex": re.escape(query), "$options": "i"}
                     },
-                    {"text": 1, "chunk_id": 1, "topic": 1}
-                ).limit(limit)
-                results = list(cursor)
+                    {"text": 1, "chunk_id": 1, "topic": 1, "_id": 0}
+                ).limit(limit).batch_size(limit)
+                results = await cursor.to_list(length=limit)
             
             return results
         except Exception as e:
@@ -130,12 +238,12 @@ class MongoDBClient:
     
     # =============== REVISION SESSION METHODS ===============
     
-    def save_revision_session(self, session_data: Dict[str, Any]) -> bool:
+    async def save_revision_session(self, session_data: Dict[str, Any]) -> bool:
         """Save or update revision session in MongoDB"""
         try:
-            session_data["updated_at"] = datetime.now()
+            session_data["updated_at"] = datetime.now(timezone.utc)
             
-            result = self.revision_collection.update_one(
+            result = await self.revision_collection.update_one(
                 {"session_id": session_data["session_id"]},
                 {"$set": session_data},
                 upsert=True
@@ -147,19 +255,22 @@ class MongoDBClient:
             logger.error(f"Error saving revision session: {e}")
             return False
     
-    def get_revision_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+    async def get_revision_session(self, session_id: str, include_history: bool = True) -> Optional[Dict[str, Any]]:
         """Get revision session by session_id"""
         try:
-            session = self.revision_collection.find_one(
+            projection = {"_id": 0}
+            if not include_history:
+                projection["conversation_history"] = 0
+            session = await self.revision_collection.find_one(
                 {"session_id": session_id},
-                {"_id": 0}
+                projection
             )
             return session
         except Exception as e:
             logger.error(f"Error fetching revision session: {e}")
             return None
     
-    def get_student_revision_history(self, student_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    async def get_student_revision_history(self, student_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """Get revision history for a student"""
         try:
             cursor = self.revision_collection.find(
@@ -167,16 +278,16 @@ class MongoDBClient:
                 {"_id": 0}
             ).sort("started_at", -1).limit(limit)
             
-            return list(cursor)
+            return await cursor.to_list(length=limit)
         except Exception as e:
             logger.error(f"Error fetching student revision history: {e}")
             return []
     
-    def get_topic_revision_stats(self, topic: str) -> Dict[str, Any]:
+    async def get_topic_revision_stats(self, topic: str) -> Dict[str, Any]:
         """Get statistics for topic revisions"""
         try:
-            total_sessions = self.revision_collection.count_documents({"topic": topic})
-            completed_sessions = self.revision_collection.count_documents({
+            total_sessions = await self.revision_collection.count_documents({"topic": topic})
+            completed_sessions = await self.revision_collection.count_documents({
                 "topic": topic, 
                 "is_complete": True
             })
@@ -187,7 +298,7 @@ class MongoDBClient:
                 {"$group": {"_id": None, "avg_interactions": {"$avg": "$conversation_count"}}}
             ]
             
-            avg_result = list(self.revision_collection.aggregate(pipeline))
+            avg_result = await self.revision_collection.aggregate(pipeline).to_list(length=1)
             avg_interactions = avg_result[0]["avg_interactions"] if avg_result else 0
             
             return {
@@ -201,14 +312,14 @@ class MongoDBClient:
             logger.error(f"Error fetching topic revision stats: {e}")
             return {}
     
-    def save_conversation_turn(self, session_id: str, turn_data: Dict[str, Any]) -> bool:
+    async def save_conversation_turn(self, session_id: str, turn_data: Dict[str, Any]) -> bool:
         """Save a conversation turn to the session"""
         try:
-            result = self.revision_collection.update_one(
+            result = await self.revision_collection.update_one(
                 {"session_id": session_id},
                 {
                     "$push": {"conversation_history": turn_data},
-                    "$set": {"updated_at": datetime.now()}
+                    "$set": {"updated_at": datetime.now(timezone.utc)}
                 }
             )
             
@@ -217,12 +328,87 @@ class MongoDBClient:
             logger.error(f"Error saving conversation turn: {e}")
             return False
     
-    def update_session_progress(self, session_id: str, progress_data: Dict[str, Any]) -> bool:
+    async def update_session_turn_and_progress(self, session_id: str, turn_data: Dict[str, Any], 
+                                               progress_data: Dict[str, Any], priority: bool = False) -> bool:
+        """Append a conversation turn and update session progress in one write"""
+        progress_data["updated_at"] = datetime.now(timezone.utc)
+        update = {
+            "$push": {"conversation_history": turn_data},
+            "$set": progress_data
+        }
+        
+        # With the write-behind task running, queue the update; priority callers wait for its batch
+        if self._writer_task is not None and not self._writer_task.done():
+            done = asyncio.get_running_loop().create_future() if priority else None
+            self._write_queue.put_nowait((UpdateOne({"session_id": session_id}, update), done))
+            return await done if done is not None else True
+        
+        try:
+            result = await self.revision_collection.update_one({"session_id": session_id}, update)
+            return result.modified_count > 0
+        except Exception as e:
+            logger.error(f"Error saving conversation turn and progress: {e}")
+            return False
+    
+    # =============== WRITE-BEHIND ===============
+    
+    def start_write_behind(self):
+        """Start the background task that batches queued session updates"""
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._drain_writes())
+    
+    async def flush_writes(self):
+        """Write out every queued session update and stop the write-behind task"""
+        if self._writer_task is None:
+            return
+        self._write_queue.put_nowait(None)
+        await self._writer_task
+        self._writer_task = None
+    
+    async def _drain_writes(self):
+        """Collect queued updates into batches and write each batch with one bulk_write"""
+        batch_size = Config.SESSION_WRITE_BATCH_SIZE
+        stopping = False
+        
+        while not stopping:
+            item = await self._write_queue.get()
+            if item is None:
+                break
+            batch = [item]
+            
+            # Give concurrent turns a moment to join the batch unless it is already full
+            if self._write_queue.qsize() < batch_size - 1:
+                await asyncio.sleep(Config.SESSION_WRITE_FLUSH_INTERVAL_SECONDS)
+            
+            while len(batch) < batch_size and not self._write_queue.empty():
+                item = self._write_queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._write_batch(batch)
+    
+    async def _write_batch(self, batch: List[Tuple[UpdateOne, Optional[asyncio.Future]]]):
+        """Apply a batch of session updates, resolving any waiting priority writes"""
+        try:
+            # Ordered, so successive turns of one session are applied in sequence
+            await self.revision_collection.bulk_write([op for op, _ in batch], ordered=True)
+            succeeded = True
+        except Exception as e:
+            logger.error(f"Error writing batch of {len(batch)} session updates: {e}")
+            succeeded = False
+        
+        for _, done in batch:
+            if done is not None and not done.done():
+                done.set_result(succeeded)
+    
+    async def update_session_progress(self, session_id: str, progress_data: Dict[str, Any]) -> bool:
         """Update session progress"""
         try:
-            progress_data["updated_at"] = datetime.now()
+            progress_data["updated_at"] = datetime.now(timezone.utc)
             
-            result = self.revision_collection.update_one(
+            result = await self.revision_collection.update_one(
                 {"session_id": session_id},
                 {"$set": progress_data}
             )
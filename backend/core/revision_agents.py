@@ -1,22 +1,75 @@
 from langchain.schema import HumanMessage, SystemMessage
-from typing import List, Dict, Any, Optional, Callable
+from cachetools import TTLCache
+from typing import List, Dict, Any, Optional, Callable, Awaitable, AsyncIterator, Tuple
+from collections import defaultdict
+from contextvars import ContextVar
+import bisect
 import logging
-from backend.core.llm import GeminiLLMWrapper
+import re
+from backend.core.llm import GeminiLLMWrapper, FALLBACK_RESPONSE, StreamInterruptedError
+from backend.core.answer_cache import SemanticAnswerCache
 from backend.core.mongodb_client import MongoDBClient
 from backend.models.schemas import SessionState
 from backend.config import Config
-from backend.prompts.revision_prompts import RevisionPrompts
-from datetime import datetime
-import random
+from backend.prompts.revision_prompts import (
+    get_conclusion_prompt,
+    get_engaging_question_prompt,
+    get_mini_quiz_prompt,
+    get_progress_tracking_prompt,
+    get_progressive_recap_prompt,
+    get_question_handling_prompt,
+    get_quiz_feedback_prompt,
+    get_session_opener_prompt,
+    get_topic_kickoff_prompt,
+    parse_concept_line,
+    parse_session_opener,
+)
+from datetime import datetime, timedelta, timezone
+import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
+DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+DIFFICULTY_THRESHOLDS = (6, 12)  # 0-5: easy, 6-11: medium, 12+: hard
+
+# One canonical system prompt for every stage keeps the request prefix identical
+# across turns so provider-side prompt caching can reuse it
+TUTOR_SYSTEM_INSTRUCTION = "You are an expert educational tutor conducting a progressive revision session."
+TUTOR_SYSTEM_MESSAGE = SystemMessage(content=TUTOR_SYSTEM_INSTRUCTION)
+
+# Set for the duration of a streamed turn; _ask_tutor forwards generated text to it
+_stream_sink: ContextVar[Optional[asyncio.Queue]] = ContextVar("revision_stream_sink", default=None)
+
+# SessionState fields written to the session document when it is created
+PERSISTED_SESSION_FIELDS = {
+    "session_id", "student_id", "topic", "started_at", "conversation_count", "is_complete",
+    "current_chunk_index", "concept_chunks", "max_conversations", "completion_threshold",
+    "verbose_prompts"
+}
+
 class ProgressiveRevisionAgent:
     def __init__(self, llm_wrapper: GeminiLLMWrapper, mongodb_client: MongoDBClient):
         self.llm = llm_wrapper
         self.mongodb = mongodb_client
-        self.session_states: Dict[str, SessionState] = {}
-        self.prompts = RevisionPrompts()
+        # Idle sessions expire and are restored from MongoDB on next access
+        self.session_states: TTLCache = TTLCache(
+            maxsize=Config.SESSION_CACHE_MAX_SIZE,
+            ttl=Config.SESSION_CACHE_TTL_SECONDS
+        )
+        self._background_tasks: set = set()
+        # Topic content is effectively static, so share it across sessions
+        self._topic_content_cache: TTLCache = TTLCache(
+            maxsize=Config.TOPIC_CONTENT_CACHE_MAX_SIZE,
+            ttl=Config.TOPIC_CONTENT_CACHE_TTL_SECONDS
+        )
+        self._topic_content_locks: Dict[tuple, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # Near-identical questions on a topic reuse an earlier answer
+        self._answer_cache = SemanticAnswerCache(
+            similarity_threshold=Config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            max_entries_per_topic=Config.ANSWER_CACHE_MAX_ENTRIES_PER_TOPIC,
+            ttl_seconds=Config.ANSWER_CACHE_TTL_SECONDS
+        )
         
         # Flow configuration - defines the revision flow pattern
         self.flow_config = {
@@ -31,26 +84,42 @@ class ProgressiveRevisionAgent:
                 "general": self._handle_general_interaction
             },
             
-            "stage_patterns": [
-                {"stage": "kickoff_response", "condition": "conversation_count == 1"},
-                {"stage": "user_question", "condition": "has_question_indicators"},
-                {"stage": "mini_quiz", "condition": "conversation_count % 5 == 0 and conversation_count > 5"},
-                {"stage": "engaging_question", "condition": "conversation_count % 3 == 0 and conversation_count > 2"},
-                {"stage": "progress_check", "condition": "conversation_count % 8 == 0 and conversation_count > 8"},
-                {"stage": "progressive_recap", "condition": "default"}
-            ],
-            
             "question_indicators": ["?", "what", "why", "how", "explain", "tell me", "help", "can you"],
+            "quick_recap_indicators": ["quick", "recap", "summary", "brief", "short"],
             "session_end_phrases": ["end session", "finish", "complete", "done", "exit", "summary"]
         }
+        
+        # Stage predicates in priority order; evaluated lazily, first match wins,
+        # and "progressive_recap" is the fallback
+        self._stage_predicates = [
+            ("kickoff_response", lambda s, q: s.conversation_count == 1),
+            ("user_question", lambda s, q: self._has_question_indicators(q)),
+            ("mini_quiz", lambda s, q: s.conversation_count > 5 and s.conversation_count % 5 == 0),
+            ("engaging_question", lambda s, q: s.conversation_count > 2 and s.conversation_count % 3 == 0),
+            ("progress_check", lambda s, q: s.conversation_count > 8 and s.conversation_count % 8 == 0)
+        ]
+        
+        # Single case-insensitive scan for any end phrase (whole words only)
+        self._session_end_re = re.compile(
+            r"\b(?:" + "|".join(map(re.escape, self.flow_config["session_end_phrases"])) + r")\b",
+            re.IGNORECASE
+        )
+        
+        # Substring matchers compiled once; IGNORECASE avoids lowering the query per turn
+        self._question_re = self._compile_phrase_matcher(self.flow_config["question_indicators"])
+        self._quick_recap_re = self._compile_phrase_matcher(self.flow_config["quick_recap_indicators"])
+    
+    @staticmethod
+    def _compile_phrase_matcher(phrases: List[str]) -> "re.Pattern":
+        """Compile phrases into a single case-insensitive alternation"""
+        return re.compile("|".join(map(re.escape, phrases)), re.IGNORECASE)
     
     async def start_revision_session(self, topic: str, student_id: str, session_id: str) -> dict:
         """Start a new revision session with topic kick-off."""
         
         # Get topic configuration
-        topic_config = Config.get_topic_config(topic)
-        max_conversations = topic_config["max_conversations"]
-        completion_threshold = topic_config["completion_threshold"]
+        max_conversations, completion_threshold = Config.get_topic_limits(topic)
+        now = datetime.now(timezone.utc)
         
         # Create new session state
         session_state = SessionState(
@@ -58,24 +127,30 @@ class ProgressiveRevisionAgent:
             topic=topic,
             student_id=student_id,
             conversation_count=0,
-            started_at=datetime.now(),
-            last_interaction=datetime.now(),
+            started_at=now,
+            last_interaction=now,
+            started_monotonic=time.monotonic(),
             is_complete=False,
             key_concepts_covered=[],
             user_understanding_level="beginner",
             max_conversations=max_conversations,
-            completion_threshold=completion_threshold
+            completion_threshold=completion_threshold,
+            verbose_prompts=Config.VERBOSE_PROMPTS
         )
         self.session_states[session_id] = session_state
 
         # Get topic content and concept chunks
-        topic_content, concept_chunks = self._initialize_topic_content(topic, session_state)
+        topic_content, _ = await self._initialize_topic_content(topic, session_state)
         
-        # Generate kick-off response
-        response = await self._generate_kickoff_response(topic, topic_content)
+        # Generate kick-off response while the context cache is registered and the session is saved
+        response, _, _ = await asyncio.gather(
+            self._generate_kickoff_response(session_state, topic_content),
+            self._create_context_cache(session_state),
+            self._save_initial_session(session_state)
+        )
         
-        # Save session to MongoDB
-        self._save_initial_session(session_id, student_id, topic, response, concept_chunks, max_conversations, completion_threshold)
+        # The kickoff turn is persisted off the response path
+        self._run_in_background(self._save_kickoff_turn(session_state, response))
 
         return self._format_session_response(response, topic, session_id, 0, False, topic_content, "kickoff", max_conversations, completion_threshold)
     
@@ -89,15 +164,26 @@ class ProgressiveRevisionAgent:
         
         # Update session state
         session_state.conversation_count += 1
-        session_state.last_interaction = datetime.now()
+        session_state.last_interaction = datetime.now(timezone.utc)
+        
+        # Before this turn's LLM calls, including the conclusion, so they never reference an expired cache
+        await self._refresh_context_cache(session_state)
         
         # Check for manual session end
         if self._should_end_session(user_query):
             return await self._complete_session(session_state)
         
+        # Sessions saved before chunks were stored inline load them lazily here
+        if not session_state.concept_chunks:
+            session_state.concept_chunks = await self._get_topic_chunks(session_state.topic)
+        
         # Determine and handle current stage
         response_data = await self._process_revision_flow(session_state, user_query)
         
+        # _complete_session already recorded the conclusion turn and built the full response
+        if response_data.get("is_session_complete"):
+            return response_data
+        
         # Save conversation and update progress
         await self._save_conversation_turn(session_state, user_query, response_data)
         
@@ -106,55 +192,180 @@ class ProgressiveRevisionAgent:
             "topic": session_state.topic,
             "session_id": session_id,
             "conversation_count": session_state.conversation_count,
-            "max_conversations": session_state.max_conversations or Config.get_max_conversations(session_state.topic),
-            "completion_threshold": session_state.completion_threshold or Config.get_completion_threshold(session_state.topic)
+            "max_conversations": session_state.max_conversations,
+            "completion_threshold": session_state.completion_threshold
         })
         
         return response_data
     
-    def _initialize_topic_content(self, topic: str, session_state: SessionState) -> tuple:
+    async def continue_revision_stream(self, session_id: str, user_query: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Continue revision, yielding reply text as it is generated and the full turn result last"""
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        # The task copies the current context, so only its LLM calls see the sink
+        token = _stream_sink.set(queue)
+        try:
+            task = asyncio.create_task(self.continue_revision(session_id, user_query))
+        finally:
+            _stream_sink.reset(token)
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        
+        streamed = False
+        while True:
+            text = await queue.get()
+            if text is None:
+                break
+            streamed = True
+            yield {"type": "chunk", "text": text}
+        
+        result = task.result()
+        # Fixed replies (session end, missing content) never reach the LLM stream
+        if not streamed:
+            yield {"type": "chunk", "text": result["response"]}
+        yield {"type": "done", **result}
+    
+    async def _initialize_topic_content(self, topic: str, session_state: SessionState) -> tuple:
         """Initialize topic content and concept chunks"""
-        topic_content = self.mongodb.get_topic_content(topic, limit=3)
-        concept_chunks = self.mongodb.get_topic_content_chunks(topic)
+        # Both reads are independent, so issue them concurrently
+        topic_content, concept_chunks = await asyncio.gather(
+            self._get_topic_content(topic),
+            self._get_topic_chunks(topic)
+        )
         session_state.concept_chunks = concept_chunks
         session_state.current_chunk_index = 0
         return topic_content, concept_chunks
     
-    async def _generate_kickoff_response(self, topic: str, topic_content: List[Dict]) -> str:
-        """Generate the initial kickoff response"""
-        content_text = "\n".join([chunk["text"][:200] + "..." for chunk in topic_content])
-        kickoff_prompt = self.prompts.get_topic_kickoff_prompt(topic, content_text)
+    async def _get_topic_content(self, topic: str, limit: int = 3) -> List[Dict]:
+        """Get kickoff content for a topic, served from the topic cache when possible"""
+        return await self._get_cached_topic_data(
+            ("content", topic, limit), lambda: self.mongodb.get_topic_content(topic, limit=limit)
+        )
+    
+    async def _get_topic_chunks(self, topic: str) -> List[Dict]:
+        """Get concept chunks for a topic, served from the topic cache when possible"""
+        return await self._get_cached_topic_data(
+            ("chunks", topic), lambda: self.mongodb.get_topic_content_chunks(topic)
+        )
+    
+    async def _get_cached_topic_data(self, key: tuple, loader: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """Return cached topic data, letting only one caller per key hit MongoDB"""
+        cached = self._topic_content_cache.get(key)
+        if cached is not None:
+            return cached
         
-        messages = [
-            SystemMessage(content="You are an expert educational tutor starting a revision session."),
-            HumanMessage(content=kickoff_prompt)
-        ]
+        lock = self._topic_content_locks[key]
+        try:
+            async with lock:
+                # Another caller may have filled the cache while we waited
+                cached = self._topic_content_cache.get(key)
+                if cached is not None:
+                    return cached
+                
+                data = await loader()
+                # Empty results usually mean a failed read, so don't pin them
+                if data:
+                    self._topic_content_cache[key] = data
+                return data
+        finally:
+            # Keys come from client-supplied topics, so don't keep a lock per key forever
+            if self._topic_content_locks.get(key) is lock:
+                del self._topic_content_locks[key]
+    
+    async def _generate_kickoff_response(self, session_state: SessionState, topic_content: List[Dict]) -> str:
+        """Generate the kickoff, prefetching the first recap and question in the same call"""
+        topic = session_state.topic
+        content_text = "\n".join(f"{chunk['text'][:200]}..." for chunk in topic_content)
+        
+        if not session_state.concept_chunks:
+            kickoff_prompt = get_topic_kickoff_prompt(topic, content_text)
+            return await self._ask_tutor(None, kickoff_prompt)
+        
+        opener_prompt = get_session_opener_prompt(
+            topic, content_text, session_state.concept_chunks[0]["text"], len(session_state.concept_chunks)
+        )
+        sections = parse_session_opener(await self._ask_tutor(None, opener_prompt))
         
-        return await self.llm.generate_response(messages)
+        if sections.get("recap"):
+            session_state.prefetched_recap = {
+                "explanation": sections["recap"],
+                "concept_name": sections.get("concept") or f"{topic} - part 1"
+            }
+        session_state.prefetched_question = sections.get("question")
+        
+        if sections.get("kickoff"):
+            return sections["kickoff"]
+        # Unusable opener output; fall back to a plain kickoff
+        kickoff_prompt = get_topic_kickoff_prompt(topic, content_text)
+        return await self._ask_tutor(None, kickoff_prompt)
+    
+    async def _create_context_cache(self, session_state: SessionState):
+        """Register the tutor instructions and topic content as a provider-side context cache"""
+        if not session_state.concept_chunks:
+            return
+        
+        topic_text = "\n\n".join(chunk["text"] for chunk in session_state.concept_chunks)
+        ttl_seconds = Config.GEMINI_CONTEXT_CACHE_TTL_SECONDS
+        cached_content_name = await self.llm.create_cached_content(
+            TUTOR_SYSTEM_INSTRUCTION,
+            [f'Study material for the topic "{session_state.topic}":\n{topic_text}'],
+            ttl_seconds
+        )
+        if cached_content_name:
+            session_state.cached_content_name = cached_content_name
+            session_state.cached_content_expires_at = session_state.last_interaction + timedelta(seconds=ttl_seconds)
+    
+    async def _refresh_context_cache(self, session_state: SessionState):
+        """Extend the session's context cache when it is close to expiring, or drop it once expired"""
+        if not session_state.cached_content_name:
+            return
+        
+        if session_state.cached_content_expires_at <= session_state.last_interaction:
+            # Idle past the cache TTL; this turn falls back to the uncached prompt
+            session_state.cached_content_name = None
+            session_state.cached_content_expires_at = None
+            return
+        
+        margin = timedelta(seconds=Config.GEMINI_CONTEXT_CACHE_REFRESH_MARGIN_SECONDS)
+        if session_state.cached_content_expires_at - session_state.last_interaction > margin:
+            return
+        
+        ttl_seconds = Config.GEMINI_CONTEXT_CACHE_TTL_SECONDS
+        if await self.llm.refresh_cached_content(session_state.cached_content_name, ttl_seconds):
+            session_state.cached_content_expires_at = session_state.last_interaction + timedelta(seconds=ttl_seconds)
+        else:
+            session_state.cached_content_name = None
+            session_state.cached_content_expires_at = None
     
-    def _save_initial_session(self, session_id: str, student_id: str, topic: str, response: str, 
-                             concept_chunks: List, max_conversations: int, completion_threshold: int):
+    async def _save_initial_session(self, session_state: SessionState):
         """Save initial session data to MongoDB"""
-        session_data = {
-            "session_id": session_id,
-            "student_id": student_id,
-            "topic": topic,
-            "started_at": datetime.now(),
-            "conversation_count": 0,
-            "is_complete": False,
+        # concept_chunks are stored inline so a resumed session needs no extra content read
+        session_data = session_state.model_dump(include=PERSISTED_SESSION_FIELDS)
+        session_data.update({
             "stage": "kickoff",
-            "concept_chunks_total": len(concept_chunks),
-            "current_chunk_index": 0,
-            "max_conversations": max_conversations,
-            "completion_threshold": completion_threshold,
-            "conversation_history": [{
-                "turn": 0,
-                "type": "kickoff",
-                "assistant_message": response,
-                "timestamp": datetime.now()
-            }]
+            "concept_chunks_total": len(session_state.concept_chunks),
+            "conversation_history": []
+        })
+        await self.mongodb.save_revision_session(session_data)
+    
+    async def _save_kickoff_turn(self, session_state: SessionState, response: str):
+        """Record the kickoff message and context cache details on the saved session"""
+        kickoff_turn = {
+            "turn": 0,
+            "type": "kickoff",
+            "assistant_message": response,
+            "timestamp": datetime.now(timezone.utc)
+        }
+        cache_data = {
+            "cached_content_name": session_state.cached_content_name,
+            "cached_content_expires_at": session_state.cached_content_expires_at
         }
-        self.mongodb.save_revision_session(session_data)
+        await self.mongodb.update_session_turn_and_progress(session_state.session_id, kickoff_turn, cache_data)
+    
+    def _run_in_background(self, coro):
+        """Schedule a coroutine without awaiting it, keeping a reference until it finishes"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
     
     def _format_session_response(self, response: str, topic: str, session_id: str, conversation_count: int,
                                 is_complete: bool, sources: List, stage: str, max_conversations: int, 
@@ -173,13 +384,21 @@ class ProgressiveRevisionAgent:
             "completion_threshold": completion_threshold
         }
     
+    @property
+    def active_session_count(self) -> int:
+        """Number of sessions currently held in memory"""
+        return len(self.session_states)
+    
     async def _get_or_restore_session(self, session_id: str) -> Optional[SessionState]:
         """Get existing session or restore from MongoDB"""
-        if session_id in self.session_states:
-            return self.session_states[session_id]
+        session_state = self.session_states.get(session_id)
+        if session_state is not None:
+            # Re-insert to refresh the TTL of active sessions
+            self.session_states[session_id] = session_state
+            return session_state
         
         # Try to restore from MongoDB
-        session_data = self.mongodb.get_revision_session(session_id)
+        session_data = await self.mongodb.get_revision_session(session_id, include_history=False)
         if session_data:
             session_state = self._restore_session_state(session_data)
             self.session_states[session_id] = session_state
@@ -192,8 +411,7 @@ class ProgressiveRevisionAgent:
         if not user_query:
             return False
         
-        user_query_lower = user_query.lower()
-        return any(phrase in user_query_lower for phrase in self.flow_config["session_end_phrases"])
+        return self._session_end_re.search(user_query) is not None
     
     async def _process_revision_flow(self, session_state: SessionState, user_query: Optional[str]) -> Dict[str, Any]:
         """Process revision flow using configuration-driven approach"""
@@ -216,61 +434,47 @@ class ProgressiveRevisionAgent:
             }
     
     def _determine_stage_from_config(self, session_state: SessionState, user_query: Optional[str]) -> str:
-        """Determine stage using configuration patterns"""
+        """Determine stage using the precompiled stage predicates"""
         
-        # Evaluate each pattern in order
-        for pattern in self.flow_config["stage_patterns"]:
-            if self._evaluate_stage_condition(pattern["condition"], session_state, user_query):
-                return pattern["stage"]
-        
-        return "general"  # Default fallback
-    
-    def _evaluate_stage_condition(self, condition: str, session_state: SessionState, user_query: Optional[str]) -> bool:
-        """Evaluate stage condition dynamically"""
-        
-        conversation_count = session_state.conversation_count
-        
-        # Handle different condition types
-        condition_checks = {
-            "conversation_count == 1": conversation_count == 1,
-            "has_question_indicators": self._has_question_indicators(user_query),
-            "conversation_count % 5 == 0 and conversation_count > 5": conversation_count % 5 == 0 and conversation_count > 5,
-            "conversation_count % 3 == 0 and conversation_count > 2": conversation_count % 3 == 0 and conversation_count > 2,
-            "conversation_count % 8 == 0 and conversation_count > 8": conversation_count % 8 == 0 and conversation_count > 8,
-            "default": True
-        }
+        for stage, predicate in self._stage_predicates:
+            if predicate(session_state, user_query):
+                return stage
         
-        return condition_checks.get(condition, False)
+        return "progressive_recap"
     
     def _has_question_indicators(self, user_query: Optional[str]) -> bool:
         """Check if user query has question indicators"""
         if not user_query:
             return False
         
-        user_query_lower = user_query.lower()
-        return any(indicator in user_query_lower for indicator in self.flow_config["question_indicators"])
+        return self._question_re.search(user_query) is not None
     
     async def _save_conversation_turn(self, session_state: SessionState, user_query: Optional[str], response_data: Dict[str, Any]):
         """Save conversation turn and update progress"""
         
-        # Save conversation turn
         turn_data = {
             "turn": session_state.conversation_count,
             "user_message": user_query,
             "assistant_message": response_data["response"],
             "stage": response_data["current_stage"],
-            "timestamp": datetime.now()
+            "timestamp": session_state.last_interaction
         }
-        self.mongodb.save_conversation_turn(session_state.session_id, turn_data)
         
-        # Update session progress
         progress_data = {
             "conversation_count": session_state.conversation_count,
             "current_stage": response_data["current_stage"],
-            "current_chunk_index": getattr(session_state, 'current_chunk_index', 0),
-            "concepts_covered": session_state.key_concepts_covered
+            "current_chunk_index": session_state.current_chunk_index,
+            # Copied, since the write may be batched after the next turn has appended to it
+            "concepts_covered": list(session_state.key_concepts_covered),
+            "cached_content_name": session_state.cached_content_name,
+            "cached_content_expires_at": session_state.cached_content_expires_at
         }
-        self.mongodb.update_session_progress(session_state.session_id, progress_data)
+        
+        # Push the turn and update progress in a single write; quiz results are written through
+        await self.mongodb.update_session_turn_and_progress(
+            session_state.session_id, turn_data, progress_data,
+            priority=response_data["current_stage"] == "quiz_feedback"
+        )
     
     # =============== STAGE HANDLERS ===============
     
@@ -278,23 +482,23 @@ class ProgressiveRevisionAgent:
         """Handle user's response to kickoff"""
         
         # Determine revision mode
-        revision_mode_indicators = ["quick", "recap", "summary", "brief", "short"]
-        is_quick_recap = any(phrase in user_query.lower() for phrase in revision_mode_indicators)
+        is_quick_recap = bool(user_query) and self._quick_recap_re.search(user_query) is not None
         session_state.revision_mode = "quick_recap" if is_quick_recap else "deep_dive"
         
-        # Initialize concept chunks if needed
-        if not hasattr(session_state, 'concept_chunks'):
-            session_state.concept_chunks = self.mongodb.get_topic_content_chunks(session_state.topic)
-        
         session_state.current_chunk_index = 0
         
         if session_state.concept_chunks:
             first_chunk = session_state.concept_chunks[0]
-            response = await self._generate_progressive_recap_response(session_state, first_chunk, 1, len(session_state.concept_chunks))
+            if session_state.prefetched_recap:
+                # Already generated alongside the kickoff
+                response = session_state.prefetched_recap["explanation"]
+                concept_name = session_state.prefetched_recap["concept_name"]
+                session_state.prefetched_recap = None
+            else:
+                response, concept_name = await self._generate_progressive_recap_response(session_state, first_chunk, 1, len(session_state.concept_chunks))
             
             # Track concept
-            concept_name = self._extract_concept_name(first_chunk["text"])
-            session_state.key_concepts_covered.append(concept_name)
+            self._track_concept(session_state, concept_name)
             
             return {
                 "response": response,
@@ -313,23 +517,17 @@ class ProgressiveRevisionAgent:
     async def _handle_progressive_recap(self, session_state: SessionState, user_query: Optional[str]) -> Dict[str, Any]:
         """Handle progressive recap of concepts"""
         
-        if not hasattr(session_state, 'current_chunk_index'):
-            session_state.current_chunk_index = 0
-        
         session_state.current_chunk_index += 1
         
-        if (hasattr(session_state, 'concept_chunks') and 
-            session_state.current_chunk_index < len(session_state.concept_chunks)):
+        if session_state.current_chunk_index < len(session_state.concept_chunks):
             
             current_chunk = session_state.concept_chunks[session_state.current_chunk_index]
             total_chunks = len(session_state.concept_chunks)
             
-            response = await self._generate_progressive_recap_response(session_state, current_chunk, session_state.current_chunk_index + 1, total_chunks)
+            response, concept_name = await self._generate_progressive_recap_response(session_state, current_chunk, session_state.current_chunk_index + 1, total_chunks)
             
             # Track concept
-            concept_name = self._extract_concept_name(current_chunk["text"])
-            if concept_name not in session_state.key_concepts_covered:
-                session_state.key_concepts_covered.append(concept_name)
+            self._track_concept(session_state, concept_name)
             
             return {
                 "response": response,
@@ -346,15 +544,18 @@ class ProgressiveRevisionAgent:
         last_concept = session_state.key_concepts_covered[-1] if session_state.key_concepts_covered else session_state.topic
         
         # Determine difficulty
-        difficulty_levels = ["easy", "medium", "hard"]
-        difficulty_index = min(session_state.conversation_count // 6, 2)  # 0-5: easy, 6-11: medium, 12+: hard
-        difficulty = difficulty_levels[difficulty_index]
+        difficulty = DIFFICULTY_LEVELS[bisect.bisect_right(DIFFICULTY_THRESHOLDS, session_state.conversation_count)]
         
-        response = await self._generate_engaging_question_response(session_state.topic, last_concept, difficulty)
+        if session_state.prefetched_question and session_state.key_concepts_covered:
+            # The first question comes from the session opener and checks the first concept
+            response, question_concept = session_state.prefetched_question, session_state.key_concepts_covered[0]
+            session_state.prefetched_question = None
+        else:
+            response, question_concept = await self._generate_engaging_question_response(session_state, last_concept, difficulty)
         
         # Set expectation for answer
         session_state.expecting_answer = True
-        session_state.current_question_concept = last_concept
+        session_state.current_question_concept = question_concept
         
         return {
             "response": response,
@@ -367,7 +568,7 @@ class ProgressiveRevisionAgent:
         """Handle mini-quiz creation and evaluation"""
         
         # Check if evaluating previous quiz
-        if hasattr(session_state, 'quiz_in_progress') and session_state.quiz_in_progress:
+        if session_state.quiz_in_progress:
             return await self._evaluate_quiz_answers(session_state, user_query)
         
         # Create new quiz
@@ -376,11 +577,11 @@ class ProgressiveRevisionAgent:
             concepts_for_quiz = [session_state.topic]
         
         num_questions = min(3, len(concepts_for_quiz))
-        response = await self._generate_mini_quiz_response(session_state.topic, concepts_for_quiz, num_questions)
+        response, concepts_tested = await self._generate_mini_quiz_response(session_state, concepts_for_quiz, num_questions)
         
         # Mark quiz as in progress
         session_state.quiz_in_progress = True
-        session_state.quiz_concepts = concepts_for_quiz
+        session_state.quiz_concepts = concepts_tested
         
         return {
             "response": response,
@@ -392,34 +593,47 @@ class ProgressiveRevisionAgent:
     async def _handle_user_question(self, session_state: SessionState, user_query: str) -> Dict[str, Any]:
         """Handle user questions"""
         
-        relevant_content = self.mongodb.search_topic_content(session_state.topic, user_query, limit=3)
-        context = "\n".join([chunk["text"] for chunk in relevant_content]) if relevant_content else ""
+        query_embedding = await self.llm.embed_query(user_query)
+        cached_answer = self._answer_cache.lookup(session_state.topic, query_embedding) if query_embedding else None
         
-        response = await self._generate_question_handling_response(user_query, session_state.topic, context)
+        if cached_answer is not None:
+            response, sources = cached_answer
+        else:
+            relevant_content = await self.mongodb.search_topic_content(session_state.topic, user_query, limit=3)
+            context, sources = self._build_context(relevant_content)
+            
+            response, complete = await self._generate_question_handling_response(session_state, user_query, context)
+            
+            # Fallbacks and streams cut off mid-answer must not be served to other students
+            if query_embedding and complete:
+                self._answer_cache.store(session_state.topic, query_embedding, response, sources)
         
         return {
             "response": response,
             "current_stage": "user_question",
             "is_session_complete": False,
-            "sources": [chunk.get("chunk_id", "Unknown") for chunk in relevant_content]
+            "sources": sources
         }
     
     async def _handle_progress_check(self, session_state: SessionState, user_query: Optional[str] = None) -> Dict[str, Any]:
         """Handle progress tracking"""
         
-        total_concepts = len(session_state.concept_chunks) if hasattr(session_state, 'concept_chunks') else len(session_state.key_concepts_covered)
-        concepts_completed = len(session_state.key_concepts_covered)
+        if session_state.concept_chunks:
+            # Count recapped chunks, not distinct concept names: two chunks may share a name
+            total_concepts = len(session_state.concept_chunks)
+            concepts_completed = min(session_state.current_chunk_index + 1, total_concepts)
+        else:
+            total_concepts = len(session_state.key_concepts_covered)
+            concepts_completed = total_concepts
         
         percentage = (concepts_completed / total_concepts * 100) if total_concepts > 0 else (session_state.conversation_count / session_state.completion_threshold * 100)
         
-        response = await self._generate_progress_tracking_response(session_state.topic, concepts_completed, total_concepts, percentage)
-        
-        # Check completion
-        completion_threshold = session_state.completion_threshold or Config.get_completion_threshold(session_state.topic)
-        
-        if (percentage >= 90 or concepts_completed >= total_concepts or session_state.conversation_count >= completion_threshold):
+        # Check completion first so a finished session costs only the conclusion call
+        if (percentage >= 90 or concepts_completed >= total_concepts or session_state.conversation_count >= session_state.completion_threshold):
             return await self._complete_session(session_state)
         
+        response = await self._generate_progress_tracking_response(session_state, concepts_completed, total_concepts, percentage)
+        
         return {
             "response": response,
             "current_stage": "progress_check",
@@ -433,20 +647,12 @@ class ProgressiveRevisionAgent:
         
         session_state.quiz_in_progress = False
         
-        feedback_prompt = f"""
-        Provide encouraging feedback for a student's quiz attempt in the topic "{session_state.topic}".
-        Student's response: "{user_answer}"
-        Quiz concepts: {getattr(session_state, 'quiz_concepts', [])}
-        
-        Provide encouraging feedback, brief explanation, and motivation with emojis.
-        """
-        
-        messages = [
-            SystemMessage(content="You are an expert educational tutor providing quiz feedback."),
-            HumanMessage(content=feedback_prompt)
-        ]
+        static_prompt, dynamic_prompt = get_quiz_feedback_prompt(
+            session_state.topic, user_answer, session_state.quiz_concepts
+        )
         
-        response = await self.llm.generate_response(messages)
+        # Static instructions first so every quiz feedback call shares the same prompt prefix
+        response = await self._ask_tutor(session_state, f"{static_prompt}\n\n{dynamic_prompt}")
         
         return {
             "response": response,
@@ -461,83 +667,174 @@ class ProgressiveRevisionAgent:
     
 
     
-    async def _generate_progressive_recap_response(self, session_state: SessionState, chunk: Dict, chunk_num: int, total_chunks: int) -> str:
-        """Generate progressive recap response"""
-        prompt = self.prompts.get_progressive_recap_prompt(session_state.topic, chunk["text"], chunk_num, total_chunks)
-        messages = [
-            SystemMessage(content="You are an expert educational tutor providing progressive concept explanation."),
-            HumanMessage(content=prompt)
-        ]
-        return await self.llm.generate_response(messages)
-    
-    async def _generate_engaging_question_response(self, topic: str, concept: str, difficulty: str) -> str:
-        """Generate engaging question response"""
-        prompt = self.prompts.get_engaging_question_prompt(topic, concept, difficulty)
-        messages = [
-            SystemMessage(content="You are an expert educational tutor creating engaging questions."),
-            HumanMessage(content=prompt)
-        ]
-        return await self.llm.generate_response(messages)
-    
-    async def _generate_mini_quiz_response(self, topic: str, concepts: List[str], num_questions: int) -> str:
-        """Generate mini quiz response"""
-        prompt = self.prompts.get_mini_quiz_prompt(topic, concepts, num_questions)
-        messages = [
-            SystemMessage(content="You are an expert educational tutor creating mini-quizzes."),
-            HumanMessage(content=prompt)
-        ]
-        return await self.llm.generate_response(messages)
-    
-    async def _generate_question_handling_response(self, user_query: str, topic: str, context: str) -> str:
-        """Generate question handling response"""
-        prompt = self.prompts.get_question_handling_prompt(user_query, topic, context)
-        messages = [
-            SystemMessage(content="You are an expert educational tutor answering student questions."),
-            HumanMessage(content=prompt)
-        ]
-        return await self.llm.generate_response(messages)
-    
-    async def _generate_progress_tracking_response(self, topic: str, concepts_completed: int, total_concepts: int, percentage: float) -> str:
+    async def _generate_progressive_recap_response(self, session_state: SessionState, chunk: Dict, chunk_num: int, total_chunks: int) -> tuple:
+        """Generate progressive recap response and the name of the concept it explains"""
+        prompt = get_progressive_recap_prompt(
+            session_state.topic, chunk["text"], chunk_num, total_chunks, verbose=session_state.verbose_prompts
+        )
+        # Prose rather than JSON so the explanation streams; the concept name rides on a leading marker line
+        response, _ = await self._ask_tutor_with_status(session_state, prompt, concept_line=True)
+        concept_name, explanation = parse_concept_line(response)
+        return explanation or FALLBACK_RESPONSE, concept_name or f"{session_state.topic} - part {chunk_num}"
+    
+    async def _generate_engaging_question_response(self, session_state: SessionState, concept: str, difficulty: str) -> tuple:
+        """Generate engaging question response and the concept it tests"""
+        prompt = get_engaging_question_prompt(session_state.topic, concept, difficulty, verbose=session_state.verbose_prompts)
+        data = await self._ask_tutor_json(session_state, prompt)
+        question = data.get("question")
+        if not isinstance(question, str) or not question:
+            question = FALLBACK_RESPONSE
+        tested = data.get("concept")
+        return question, tested if isinstance(tested, str) and tested else concept
+    
+    async def _generate_mini_quiz_response(self, session_state: SessionState, concepts: List[str], num_questions: int) -> tuple:
+        """Generate mini quiz response and the concepts it tests"""
+        prompt = get_mini_quiz_prompt(session_state.topic, concepts, num_questions, verbose=session_state.verbose_prompts)
+        data = await self._ask_tutor_json(session_state, prompt)
+        concepts_tested = data.get("concepts_tested")
+        if not isinstance(concepts_tested, list) or not concepts_tested:
+            concepts_tested = concepts
+        quiz = data.get("quiz")
+        if not isinstance(quiz, str) or not quiz:
+            quiz = FALLBACK_RESPONSE
+        return quiz, concepts_tested
+    
+    async def _generate_question_handling_response(self, session_state: SessionState, user_query: str, context: str) -> tuple:
+        """Generate question handling response and whether it completed"""
+        prompt = get_question_handling_prompt(user_query, session_state.topic, context, verbose=session_state.verbose_prompts)
+        return await self._ask_tutor_with_status(session_state, prompt)
+    
+    async def _generate_progress_tracking_response(self, session_state: SessionState, concepts_completed: int, total_concepts: int, percentage: float) -> str:
         """Generate progress tracking response"""
-        prompt = self.prompts.get_progress_tracking_prompt(topic, concepts_completed, total_concepts, percentage)
-        messages = [
-            SystemMessage(content="You are an expert educational tutor providing progress updates."),
-            HumanMessage(content=prompt)
-        ]
-        return await self.llm.generate_response(messages)
+        prompt = get_progress_tracking_prompt(
+            session_state.topic, concepts_completed, total_concepts, percentage, verbose=session_state.verbose_prompts
+        )
+        return await self._ask_tutor(session_state, prompt)
+    
+    async def _ask_tutor(self, session_state: Optional[SessionState], prompt: str) -> str:
+        """Send a stage prompt to the LLM, reusing the session's context cache when available"""
+        response, _ = await self._ask_tutor_with_status(session_state, prompt)
+        return response
+    
+    async def _ask_tutor_with_status(
+        self, 
+        session_state: Optional[SessionState], 
+        prompt: str, 
+        concept_line: bool = False
+    ) -> Tuple[str, bool]:
+        """Like _ask_tutor, also reporting whether the reply is complete (not a fallback or a cut-off stream).
+        
+        With concept_line, a leading "CONCEPT: ..." marker line is kept in the returned text but not streamed.
+        """
+        cached_content = session_state.cached_content_name if session_state else None
+        messages = self._tutor_messages(cached_content, prompt)
+        
+        sink = _stream_sink.get()
+        if sink is None:
+            response = await self.llm.generate_response(messages, cached_content=cached_content)
+            return response, response != FALLBACK_RESPONSE
+        
+        parts = []
+        # Text held back until the first line is known to be (or not be) a concept marker
+        pending = "" if concept_line else None
+        try:
+            async for text in self.llm.astream_response(messages, cached_content=cached_content):
+                parts.append(text)
+                if pending is not None:
+                    pending += text
+                    # Wait for the first line and the start of the text after it
+                    if not pending.lstrip().partition("\n")[2].strip():
+                        continue
+                    text, pending = self._strip_concept_line(pending), None
+                if text:
+                    sink.put_nowait(text)
+            # A reply that never got past its first line
+            remainder = self._strip_concept_line(pending) if pending else ""
+            if remainder:
+                sink.put_nowait(remainder)
+        except StreamInterruptedError:
+            # The student keeps the partial text already streamed to them
+            return "".join(parts), False
+        response = "".join(parts)
+        return response, response != FALLBACK_RESPONSE
+    
+    async def _ask_tutor_json(self, session_state: SessionState, prompt: str) -> Dict[str, Any]:
+        """Send a stage prompt expecting a JSON object back; returns {} on failure"""
+        cached_content = session_state.cached_content_name
+        messages = self._tutor_messages(cached_content, prompt)
+        return await self.llm.generate_json(messages, cached_content=cached_content) or {}
+    
+    @staticmethod
+    def _strip_concept_line(text: str) -> str:
+        """Drop a leading concept marker line and the blank lines after it, keeping the rest verbatim for the stream"""
+        concept_name, _ = parse_concept_line(text)
+        if concept_name is None:
+            return text
+        rest = text.lstrip().partition("\n")[2]
+        return re.sub(r"\A(?:[ \t]*\n)+", "", rest)
+    
+    @staticmethod
+    def _tutor_messages(cached_content: Optional[str], prompt: str) -> List:
+        """Build the message list, leaving out the system instruction the context cache already carries"""
+        if cached_content:
+            return [HumanMessage(content=prompt)]
+        return [TUTOR_SYSTEM_MESSAGE, HumanMessage(content=prompt)]
     
     # =============== HELPER METHODS ===============
     
-    def _extract_concept_name(self, text: str) -> str:
-        """Extract concept name from text"""
-        words = text.split()
-        if len(words) >= 3:
-            return " ".join(words[:3])
-        return text[:50] + "..." if len(text) > 50 else text
+    def _build_context(self, chunks: List[Dict[str, Any]]) -> tuple:
+        """Join chunk texts into a context block and collect their sources in one pass"""
+        texts = []
+        sources = []
+        for chunk in chunks:
+            texts.append(chunk["text"])
+            sources.append(chunk.get("chunk_id", "Unknown"))
+        return "\n".join(texts), sources
+    
+    def _track_concept(self, session_state: SessionState, concept_name: str):
+        """Record a newly covered concept, keeping only the most recent MAX_TRACKED_CONCEPTS"""
+        if concept_name in session_state._concepts_seen:
+            return
+        session_state._concepts_seen.add(concept_name)
+        session_state.key_concepts_covered.append(concept_name)
+        if len(session_state.key_concepts_covered) > Config.MAX_TRACKED_CONCEPTS:
+            # Forget the trimmed name too, so the set mirrors the list and a revisited concept is tracked again
+            session_state._concepts_seen.discard(session_state.key_concepts_covered.pop(0))
     
     def _restore_session_state(self, session_data: Dict[str, Any]) -> SessionState:
         """Restore session state from MongoDB data"""
         
-        session_state = SessionState(
-            session_id=session_data["session_id"],
-            topic=session_data["topic"],
-            student_id=session_data["student_id"],
-            conversation_count=session_data.get("conversation_count", 0),
-            started_at=session_data["started_at"],
-            last_interaction=session_data.get("updated_at", datetime.now()),
-            is_complete=session_data.get("is_complete", False),
-            key_concepts_covered=session_data.get("concepts_covered", []),
-            user_understanding_level="beginner",
-            max_conversations=session_data.get("max_conversations"),
-            completion_threshold=session_data.get("completion_threshold")
-        )
+        now = datetime.now(timezone.utc)
         
-        # Restore additional attributes
-        session_state.current_chunk_index = session_data.get("current_chunk_index", 0)
+        # Older sessions were saved without limits; resolve them once and store them
+        limits = {}
+        if not (session_data.get("max_conversations") and session_data.get("completion_threshold")):
+            default_max, default_threshold = Config.get_topic_limits(session_data["topic"])
+            limits = {
+                "max_conversations": session_data.get("max_conversations") or default_max,
+                "completion_threshold": session_data.get("completion_threshold") or default_threshold
+            }
+            self._run_in_background(self.mongodb.update_session_progress(session_data["session_id"], dict(limits)))
+        
+        # Stored field names match the model apart from these two; unknown keys are ignored
+        session_state = SessionState.model_validate({
+            **session_data,
+            **limits,
+            "last_interaction": session_data.get("updated_at", now),
+            "key_concepts_covered": session_data.get("concepts_covered", [])
+        })
+        
+        max_concepts = Config.MAX_TRACKED_CONCEPTS
+        if len(session_state.key_concepts_covered) > max_concepts:
+            logger.warning(f"Session {session_state.session_id} has {len(session_state.key_concepts_covered)} concepts, keeping the latest {max_concepts}")
+            session_state.key_concepts_covered = session_state.key_concepts_covered[-max_concepts:]
+        session_state._concepts_seen = set(session_state.key_concepts_covered)
         
-        # Get concept chunks if not stored
-        if not hasattr(session_state, 'concept_chunks'):
-            session_state.concept_chunks = self.mongodb.get_topic_content_chunks(session_state.topic)
+        # Only reuse a context cache that has not expired while the session was idle
+        expires_at = session_state.cached_content_expires_at
+        if not (session_state.cached_content_name and expires_at and expires_at > now):
+            session_state.cached_content_name = None
+            session_state.cached_content_expires_at = None
         
         return session_state
     
@@ -545,32 +842,53 @@ class ProgressiveRevisionAgent:
         """Complete revision session with conclusion"""
         
         session_state.is_complete = True
+        now = session_state.last_interaction
+        
+        # Sessions started in this process have a monotonic start; restored ones fall back to wall-clock time
+        if session_state.started_monotonic is not None:
+            duration_seconds = time.monotonic() - session_state.started_monotonic
+        else:
+            duration_seconds = (now - session_state.started_at).total_seconds()
         
         # Calculate statistics
         session_stats = {
             "total_interactions": session_state.conversation_count,
             "concepts_covered": len(session_state.key_concepts_covered),
-            "duration_minutes": (datetime.now() - session_state.started_at).total_seconds() / 60,
-            "completion_rate": min(100, session_state.conversation_count / session_state.completion_threshold * 100) if session_state.completion_threshold else 100
+            "duration_minutes": duration_seconds / 60,
+            "completion_rate": min(100, session_state.conversation_count / session_state.completion_threshold * 100)
         }
         
         # Generate conclusion
-        conclusion_prompt = self.prompts.get_conclusion_prompt(session_state.topic, session_state.key_concepts_covered, session_stats)
-        messages = [
-            SystemMessage(content="You are an expert educational tutor providing session conclusion."),
-            HumanMessage(content=conclusion_prompt)
-        ]
-        summary = await self.llm.generate_response(messages)
+        conclusion_prompt = get_conclusion_prompt(
+            session_state.topic, session_state.key_concepts_covered, session_stats, verbose=session_state.verbose_prompts
+        )
+        summary = await self._ask_tutor(session_state, conclusion_prompt)
+        
+        # The session takes no further turns, so stop paying for its context cache
+        if session_state.cached_content_name:
+            self._run_in_background(self.llm.delete_cached_content(session_state.cached_content_name))
+            session_state.cached_content_name = None
+            session_state.cached_content_expires_at = None
         
-        # Update session in MongoDB
+        # Record the conclusion turn and final stats in one MongoDB write
+        conclusion_turn = {
+            "turn": session_state.conversation_count,
+            "type": "conclusion",
+            "assistant_message": summary,
+            "stage": "conclusion",
+            "timestamp": now
+        }
         final_session_data = {
             "is_complete": True,
-            "completed_at": datetime.now(),
+            "completed_at": now,
             "final_stats": session_stats,
             "session_summary": summary,
             "concepts_covered": session_state.key_concepts_covered
         }
-        self.mongodb.update_session_progress(session_state.session_id, final_session_data)
+        await self.mongodb.update_session_turn_and_progress(session_state.session_id, conclusion_turn, final_session_data, priority=True)
+        
+        # Finished sessions take no further turns, so free their in-memory state now
+        self.session_states.pop(session_state.session_id, None)
         
         return {
             "response": summary,
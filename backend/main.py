@@ -6,7 +6,7 @@ from contextlib import asynccontextmanager
 
 from backend.config import Config
 from backend.core.llm import GeminiLLMWrapper
-from backend.core.mongodb_client import MongoDBClient
+from backend.core.mongodb_client import MongoDBClient, close_client
 from backend.core.revision_agents import ProgressiveRevisionAgent
 from backend.api import revision
 
@@ -31,6 +31,8 @@ async def lifespan(app: FastAPI):
         # Initialize components
         llm_wrapper = GeminiLLMWrapper()
         mongodb_client = MongoDBClient()
+        await mongodb_client.ensure_indexes()
+        mongodb_client.start_write_behind()
         revision_agent = ProgressiveRevisionAgent(llm_wrapper, mongodb_client)
         
         # Set dependencies for routers
@@ -46,7 +48,8 @@ async def lifespan(app: FastAPI):
     
     # Cleanup on shutdown
     if mongodb_client:
-        mongodb_client.client.close()
+        await mongodb_client.flush_writes()
+        close_client()
     logger.info("Application shutting down")
 
 # Create FastAPI app
@@ -75,7 +78,11 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "version": "2.0.0"}
+    return {
+        "status": "healthy",
+        "version": "2.0.0",
+        "active_sessions": revision_agent.active_session_count if revision_agent else 0
+    }
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+from typing import List, Optional, Dict, Any, Set
 from datetime import datetime
 
 class TopicResponse(BaseModel):
@@ -38,8 +38,8 @@ class SessionState(BaseModel):
     is_complete: bool = False
     key_concepts_covered: List[str] = []
     user_understanding_level: str = "beginner"
-    max_conversations: Optional[int] = None
-    completion_threshold: Optional[int] = None
+    max_conversations: int
+    completion_threshold: int
     
     # New fields for enhanced revision flow
     current_chunk_index: int = 0
@@ -50,8 +50,24 @@ class SessionState(BaseModel):
     quiz_in_progress: bool = False
     quiz_concepts: List[str] = []
     
-    class Config:
-        arbitrary_types_allowed = True
+    # Include the EXAMPLE FORMAT blocks in stage prompts
+    verbose_prompts: bool = True
+    
+    # Provider-side context cache holding the tutor instructions + topic content
+    cached_content_name: Optional[str] = None
+    cached_content_expires_at: Optional[datetime] = None
+    
+    # time.monotonic() at session start; only meaningful in the process that started it
+    started_monotonic: Optional[float] = None
+    
+    # Generated together with the kickoff and used by the first recap / question turns; not persisted
+    prefetched_recap: Optional[Dict[str, str]] = None
+    prefetched_question: Optional[str] = None
+    
+    # Mirror of key_concepts_covered for O(1) dedupe; not persisted
+    _concepts_seen: Set[str] = PrivateAttr(default_factory=set)
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
 class ConversationTurn(BaseModel):
     turn: int
@@ -1,3 +1,39 @@
-from .revision_prompts import RevisionPrompts
+from .revision_prompts import (
+    RevisionPrompts,
+    get_topic_kickoff_prompt,
+    get_progressive_recap_prompt,
+    get_engaging_question_prompt,
+    get_mini_quiz_prompt,
+    get_feedback_prompt,
+    get_progress_tracking_prompt,
+    get_conclusion_prompt,
+    get_question_handling_prompt,
+    get_quiz_feedback_prompt,
+    get_session_opener_prompt,
+    parse_session_opener,
+    parse_concept_line,
+    get_batched_question_prompt,
+    parse_batched_questions,
+    get_multi_topic_kickoff_prompt,
+    parse_multi_topic_kickoffs,
+)
 
-__all__ = ['RevisionPrompts']
\ No newline at end of file
+__all__ = [
+    'RevisionPrompts',
+    'get_topic_kickoff_prompt',
+    'get_progressive_recap_prompt',
+    'get_engaging_question_prompt',
+    'get_mini_quiz_prompt',
+    'get_feedback_prompt',
+    'get_progress_tracking_prompt',
+    'get_conclusion_prompt',
+    'get_question_handling_prompt',
+    'get_quiz_feedback_prompt',
+    'get_session_opener_prompt',
+    'parse_session_opener',
+    'parse_concept_line',
+    'get_batched_question_prompt',
+    'parse_batched_questions',
+    'get_multi_topic_kickoff_prompt',
+    'parse_multi_topic_kickoffs',
+]
\ No newline at end of file
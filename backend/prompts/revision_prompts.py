@@ -1,230 +1,251 @@
+import re
+from functools import lru_cache
+from importlib.resources import files
+from typing import Any, Dict, List, Optional, Tuple
 
-class RevisionPrompts:
-    """Centralized prompts for revision system"""
-    
-    @staticmethod
-    def get_topic_kickoff_prompt(topic: str, topic_content: str) -> str:
-        return f"""
-        You are an expert educational tutor starting a revision session for "{topic}".
-        
-        TOPIC KICK-OFF INSTRUCTIONS:
-        1. Start with a friendly, enthusiastic introduction
-        2. Clearly remind the user what topic they're revising
-        3. Ask if they want a "quick recap" or a "deep dive"
-        4. Use emojis and engaging language
-        5. Keep it conversational and encouraging
-        
-        Available content about this topic:
-        {topic_content}
-        
-        EXAMPLE FORMAT:
-        "Hey there! 🌟 Today we're diving into **{topic}** - this is going to be awesome! 
-        
-        Before we start, I'd love to know: would you prefer a quick summary to refresh your memory, or shall we do a comprehensive step-by-step breakdown? 
-        
-        Just say 'quick recap' or 'deep dive' and we'll get started! 🚀"
-        
-        Generate an engaging kick-off message following this format.
-        """
-    
-    @staticmethod
-    def get_progressive_recap_prompt(topic: str, concept_chunk: str, chunk_number: int, total_chunks: int) -> str:
-        return f"""
-        You are presenting concept chunk {chunk_number} of {total_chunks} for the topic "{topic}".
-        
-        PROGRESSIVE RECAP INSTRUCTIONS:
-        1. Present this ONE sub-concept clearly and engagingly
-        2. Use analogies, examples, and illustrations when possible
-        3. Break down complex ideas into simple terms
-        4. Use engaging narration - tell a story if appropriate
-        5. End with encouraging the user to ask questions
-        6. Keep it conversational and fun
-        
-        Concept to explain:
-        {concept_chunk}
-        
-        EXAMPLE FORMAT:
-        "Let's explore concept {chunk_number}: **[Concept Name]** 🧠
-        
-        [Engaging explanation with analogies/examples]
-        
-        Think of it like [simple analogy]. For instance, [concrete example].
-        
-        Got any questions about this part? Feel free to ask anything! 🤔"
-        
-        Generate an engaging explanation following this format.
-        """
-    
-    @staticmethod
-    def get_engaging_question_prompt(topic: str, concept: str, difficulty_level: str = "medium") -> str:
-        return f"""
-        Create an engaging question about "{concept}" from the topic "{topic}".
-        
-        QUESTION CREATION INSTRUCTIONS:
-        1. Create an interactive question (MCQ, fill-in-blank, or True/False)
-        2. Difficulty level: {difficulty_level}
-        3. Make it conversational and fun
-        4. Use emojis appropriately
-        5. Provide clear options if MCQ
-        6. Keep it relevant to the concept just explained
-        
-        EXAMPLE FORMATS:
-        
-        MCQ: "Quick check! 🌞 What do plants use sunlight for?
-        1. To make food 🍃
-        2. To absorb water 💧
-        3. To release oxygen 🌬️
-        
-        Type 1, 2, or 3!"
-        
-        Fill-in-blank: "Complete this: Plants convert sunlight into _____ during photosynthesis. 🌱"
-        
-        True/False: "True or False: Plants only perform photosynthesis during the day. 🌞/🌙"
-        
-        Create one engaging question following these formats.
-        """
-    
-    @staticmethod
-    def get_mini_quiz_prompt(topic: str, concepts_covered: list, num_questions: int = 3) -> str:
-        concepts_text = ", ".join(concepts_covered)
-        return f"""
-        Create a mini-quiz for the topic "{topic}" covering these concepts: {concepts_text}
-        
-        MINI-QUIZ INSTRUCTIONS:
-        1. Create {num_questions} varied questions
-        2. Mix question types (MCQ, True/False, fill-in-blank)
-        3. Cover different concepts from the list
-        4. Keep it fun and engaging
-        5. Use encouraging language
-        6. Number the questions clearly
-        
-        EXAMPLE FORMAT:
-        "Time for a mini-quiz! 🧠✨ Let's see how well you've grasped these concepts:
-        
-        **Question 1:** [MCQ about concept 1]
-        **Question 2:** [True/False about concept 2]  
-        **Question 3:** [Fill-in-blank about concept 3]
-        
-        Take your time and answer each one! 😊"
-        
-        Generate the mini-quiz following this format.
-        """
-    
-    @staticmethod
-    def get_feedback_prompt(user_answer: str, correct_answer: str, is_correct: bool, concept: str) -> str:
-        feedback_type = "correct" if is_correct else "incorrect"
-        return f"""
-        Provide feedback for a {feedback_type} answer about "{concept}".
-        
-        User's answer: {user_answer}
-        Correct answer: {correct_answer}
-        
-        FEEDBACK INSTRUCTIONS:
-        1. Be encouraging regardless of correctness
-        2. If correct: celebrate and reinforce learning
-        3. If incorrect: gently correct and explain why
-        4. Keep it conversational and supportive
-        5. Use appropriate emojis
-        6. Offer to explain more if needed
-        
-        EXAMPLE FORMATS:
-        
-        Correct: "Excellent! 🎉 You nailed it! {correct_answer} is absolutely right because [brief explanation]. You're really getting the hang of this! 💪"
-        
-        Incorrect: "Good try! 😊 The correct answer is actually {correct_answer}. Here's why: [gentle explanation]. Don't worry - this is a tricky concept! Want me to explain it differently? 🤔"
-        
-        Generate appropriate feedback following this format.
-        """
-    
-    @staticmethod
-    def get_progress_tracking_prompt(topic: str, concepts_completed: int, total_concepts: int, percentage: float) -> str:
-        return f"""
-        Create a progress update message for the revision session.
-        
-        PROGRESS DETAILS:
-        - Topic: {topic}
-        - Concepts completed: {concepts_completed}/{total_concepts}
-        - Progress percentage: {percentage:.0f}%
-        
-        PROGRESS MESSAGE INSTRUCTIONS:
-        1. Celebrate the progress made
-        2. Show clear progress indicator
-        3. Motivate for remaining concepts
-        4. Use encouraging language and emojis
-        5. Keep it brief but motivating
-        
-        EXAMPLE FORMAT:
-        "Great progress! 🌟 You've mastered {concepts_completed} out of {total_concepts} key concepts in **{topic}**. 
-        
-        📊 Your progress: **{percentage:.0f}% Complete** 
-        
-        You're doing amazing! Let's keep this momentum going! 🚀"
-        
-        Generate a motivating progress message following this format.
-        """
-    
-    @staticmethod
-    def get_conclusion_prompt(topic: str, concepts_covered: list, session_stats: dict) -> str:
-        concepts_text = ", ".join(concepts_covered)
-        return f"""
-        Create a conclusion message for the revision session.
-        
-        SESSION DETAILS:
-        - Topic: {topic}
-        - Concepts covered: {concepts_text}
-        - Session stats: {session_stats}
-        
-        CONCLUSION INSTRUCTIONS:
-        1. Celebrate the completion
-        2. Summarize what was learned
-        3. Provide encouraging feedback
-        4. Suggest next steps or related topics
-        5. Use celebratory emojis
-        6. Keep it motivating and positive
-        
-        EXAMPLE FORMAT:
-        "Fantastic work! 🎉✨ You've successfully completed your revision of **{topic}**!
-        
-        📚 **What you mastered today:**
-        - [Key concept 1]
-        - [Key concept 2] 
-        - [Key concept 3]
-        
-        🏆 **Your achievement:** {session_stats.get('total_interactions', 0)} interactions, {session_stats.get('correct_answers', 0)} correct answers!
-        
-        📊 **Status: COMPLETE** ✅
-        
-        🚀 **What's next?** Ready to tackle [related topic] tomorrow? You're on fire! 🔥"
-        
-        Generate an encouraging conclusion following this format.
-        """
+# Prompt text lives in templates/<name>.txt; "@include(other)" pulls in a shared block such as an example.
+# Only {identifier} / {identifier:spec} are placeholders; any other brace is literal text.
+_TEMPLATE_DIR = files(__package__) / "templates"
+_INCLUDE_RE = re.compile(r"@include\((\w+)\)")
+_PLACEHOLDER_RE = re.compile(r"(\{\w+(?::[^{}]*)?\})")
+
+def _escape_literal_braces(text: str) -> str:
+    """Double every brace outside a placeholder so format_map leaves it as written"""
+    parts = _PLACEHOLDER_RE.split(text)
+    # parts = [literal, placeholder, literal, placeholder, ..., literal]
+    parts[::2] = [part.replace("{", "{{").replace("}", "}}") for part in parts[::2]]
+    return "".join(parts)
+
+def _load_template(name: str, raw: bool = False) -> str:
+    """Read a template file once, expanding its @include references.
     
-    @staticmethod
-    def get_question_handling_prompt(user_question: str, topic: str, context: str) -> str:
-        return f"""
-        The user has asked a question during revision of "{topic}".
-        
-        User's question: "{user_question}"
-        Current context: {context}
-        
-        QUESTION HANDLING INSTRUCTIONS:
-        1. Answer the question clearly and thoroughly
-        2. Relate it back to the current topic
-        3. Use simple, understandable language
-        4. Provide examples if helpful
-        5. Encourage further questions
-        6. Keep it conversational
-        
-        EXAMPLE FORMAT:
-        "Great question! 🤔 
-        
-        [Clear, detailed answer to their question]
-        
-        [Example or analogy if relevant]
-        
-        This connects to what we're learning about {topic} because [connection].
-        
-        Does this help clarify things? Feel free to ask more questions! 😊"
-        
-        Generate a helpful response following this format.
-        """
\ No newline at end of file
+    Literal braces are escaped for format_map unless raw, which is for text used verbatim or as a format value.
+    """
+    text = (_TEMPLATE_DIR / f"{name}.txt").read_text(encoding="utf-8").strip()
+    if not raw:
+        text = _escape_literal_braces(text)
+    return _INCLUDE_RE.sub(lambda match: _load_template(match.group(1), raw), text)
+
+# Static halves carry no per-request values so they form a stable, cacheable prompt prefix
+QUIZ_FEEDBACK_SYSTEM = _load_template("quiz_feedback_system", raw=True)
+
+# is_correct -> (verdict, static instructions with only the matching example)
+_VERDICTS: Dict[bool, Tuple[str, str]] = {
+    True: ("correct", _load_template("feedback_system").format_map({"example": _load_template("feedback_correct_example", raw=True)})),
+    False: ("incorrect", _load_template("feedback_system").format_map({"example": _load_template("feedback_incorrect_example", raw=True)})),
+}
+
+# Appended to structured prompts. The recap stays streamable prose with its concept name on a leading marker
+# line; the question and mini-quiz replies are parsed with json.loads instead of scraping text.
+_RECAP_CONCEPT_LINE_HINT = 'Start your reply with one line of the form "CONCEPT: <short name of the concept explained>", then write the explanation.'
+
+_QUESTION_JSON_HINT = 'Respond with a JSON object of the form:\n{"question": "<one engaging question>", "concept": "<the concept the question tests>"}'
+
+_MINI_QUIZ_JSON_HINT = 'Respond with a JSON object of the form:\n{"quiz": "<the mini-quiz>", "concepts_tested": ["<concept tested by each question>"]}'
+
+# The kick-off content block is spliced in verbatim between two small templates that only need the topic
+_TOPIC_KICKOFF_HEADER, _TOPIC_KICKOFF_FOOTER = _load_template("topic_kickoff").split("{topic_content}")
+
+# Registry of every prompt template by name; rendering is a dict lookup plus format_map
+_TEMPLATES: Dict[str, str] = {
+    "topic_kickoff_header": _TOPIC_KICKOFF_HEADER,
+    "topic_kickoff_footer": _TOPIC_KICKOFF_FOOTER,
+    **{
+        name: _load_template(name)
+        for name in ("progressive_recap", "engaging_question", "mini_quiz", "feedback", "progress_tracking",
+                     "conclusion", "question_handling", "quiz_feedback", "session_opener", "batched_question",
+                     "multi_topic_kickoff")
+    },
+}
+
+def _without_examples(template: str) -> str:
+    """Drop the EXAMPLE FORMAT block, keeping the instructions and the closing line"""
+    closing = template.rsplit("\n", 1)[-1]
+    closing = closing.replace(" following this format", "").replace(" following these formats", "")
+    return template[:template.index("EXAMPLE FORMAT")] + closing
+
+# Terse variants for callers that opt out of verbose prompting
+_TEMPLATES.update({
+    f"{name}_terse": _without_examples(_TEMPLATES[name])
+    for name in ("progressive_recap", "engaging_question", "mini_quiz",
+                 "progress_tracking", "conclusion", "question_handling")
+})
+
+def _render(name: str, values: Dict[str, Any], verbose: bool = True) -> str:
+    """Render a registered template with the given values, leaving out its examples unless verbose"""
+    return _TEMPLATES[name if verbose else f"{name}_terse"].format_map(values)
+
+# Beyond a handful of questions per call, latency grows faster than the round trips saved
+MAX_BATCHED_QUESTIONS = 8
+MAX_BATCHED_KICKOFFS = 8
+
+_SECTION_MARKER_RE = re.compile(r"^\s*---SECTION:([A-Z]+)---\s*$", re.MULTILINE)
+_CONCEPT_LINE_RE = re.compile(r"\s*\**CONCEPT:\**\s*(.*)")
+_ANSWER_LABEL_RE = re.compile(r"\[A(\d+)\](.*?)(?=\[A\d+\]|$)", re.DOTALL)
+_OUT_LABEL_RE = re.compile(r"\[OUT_(\d+)\](.*?)(?=\[OUT_\d+\]|$)", re.DOTALL)
+
+# Builders whose output depends only on their (hashable) arguments are memoized; the ones that embed
+# free-form student input or per-session stats would rarely hit and are left uncached
+_PROMPT_CACHE_SIZE = 512
+
+@lru_cache(maxsize=256)
+def _join_concepts(concepts: Tuple[str, ...]) -> str:
+    """Comma-join concept names; cached since the same list is re-sent across a session"""
+    return ", ".join(concepts)
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def get_topic_kickoff_prompt(topic: str, topic_content: str) -> str:
+    values = {"topic": topic}
+    return "".join([
+        _render("topic_kickoff_header", values),
+        topic_content,
+        _render("topic_kickoff_footer", values)
+    ])
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def get_progressive_recap_prompt(topic: str, concept_chunk: str, chunk_number: int, total_chunks: int, structured: bool = True, verbose: bool = True) -> str:
+    prompt = _render("progressive_recap", {
+        "chunk_number": chunk_number,
+        "total_chunks": total_chunks,
+        "topic": topic,
+        "concept_chunk": concept_chunk
+    }, verbose)
+    return f"{prompt}\n\n{_RECAP_CONCEPT_LINE_HINT}" if structured else prompt
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def get_engaging_question_prompt(topic: str, concept: str, difficulty_level: str = "medium", structured: bool = True, verbose: bool = True) -> str:
+    prompt = _render("engaging_question", {
+        "concept": concept,
+        "topic": topic,
+        "difficulty_level": difficulty_level
+    }, verbose)
+    return f"{prompt}\n\n{_QUESTION_JSON_HINT}" if structured else prompt
+
+def get_mini_quiz_prompt(topic: str, concepts_covered: list, num_questions: int = 3, structured: bool = True, verbose: bool = True) -> str:
+    return _mini_quiz_prompt(topic, tuple(concepts_covered), num_questions, structured, verbose)
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def _mini_quiz_prompt(topic: str, concepts: Tuple[str, ...], num_questions: int, structured: bool, verbose: bool) -> str:
+    prompt = _render("mini_quiz", {
+        "topic": topic,
+        "concepts_text": ", ".join(concepts),
+        "num_questions": num_questions
+    }, verbose)
+    return f"{prompt}\n\n{_MINI_QUIZ_JSON_HINT}" if structured else prompt
+
+def get_feedback_prompt(user_answer: str, correct_answer: str, is_correct: bool, concept: str) -> Tuple[str, str]:
+    """Return (static instructions, dynamic values) so the static half can be cached"""
+    verdict, system_prompt = _VERDICTS[is_correct]
+    return system_prompt, _render("feedback", {
+        "user_answer": user_answer,
+        "correct_answer": correct_answer,
+        "concept": concept,
+        "verdict": verdict
+    })
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def get_progress_tracking_prompt(topic: str, concepts_completed: int, total_concepts: int, percentage: float, verbose: bool = True) -> str:
+    return _render("progress_tracking", {
+        "topic": topic,
+        "concepts_completed": concepts_completed,
+        "total_concepts": total_concepts,
+        "percentage": percentage
+    }, verbose)
+
+def get_conclusion_prompt(topic: str, concepts_covered: list, session_stats: dict, verbose: bool = True) -> str:
+    concepts_text = _join_concepts(tuple(concepts_covered))
+    return _render("conclusion", {
+        "topic": topic,
+        "concepts_text": concepts_text,
+        "session_stats": session_stats,
+        "total_interactions": session_stats.get("total_interactions", 0),
+        "correct_answers": session_stats.get("correct_answers", 0)
+    }, verbose)
+
+def get_question_handling_prompt(user_question: str, topic: str, context: str, verbose: bool = True) -> str:
+    return _render("question_handling", {
+        "topic": topic,
+        "user_question": user_question,
+        "context": context
+    }, verbose)
+
+def get_quiz_feedback_prompt(topic: str, user_answer: str, quiz_concepts: list) -> Tuple[str, str]:
+    """Return (static instructions, dynamic values) so the static half can be cached"""
+    return QUIZ_FEEDBACK_SYSTEM, _render("quiz_feedback", {
+        "topic": topic,
+        "user_answer": user_answer,
+        "quiz_concepts": quiz_concepts
+    })
+
+@lru_cache(maxsize=_PROMPT_CACHE_SIZE)
+def get_session_opener_prompt(topic: str, topic_content: str, first_chunk: str, total_chunks: int) -> str:
+    """Kick-off, first recap and first question in one prompt, split by section markers"""
+    return _render("session_opener", {
+        "topic": topic,
+        "chunk_number": 1,
+        "topic_content": topic_content,
+        "first_chunk": first_chunk,
+        "total_chunks": total_chunks
+    })
+
+def parse_session_opener(text: str) -> Dict[str, str]:
+    """Split a session-opener response into {"kickoff", "recap", "concept", "question"} sections"""
+    parts = _SECTION_MARKER_RE.split(text)
+    # parts = [preamble, NAME, body, NAME, body, ...]
+    return {name.lower(): body.strip() for name, body in zip(parts[1::2], parts[2::2]) if body.strip()}
+
+def parse_concept_line(text: str) -> Tuple[Optional[str], str]:
+    """Split a leading "CONCEPT: <name>" line off a recap; (None, text) when the reply has no such line"""
+    first_line, _, rest = text.lstrip().partition("\n")
+    match = _CONCEPT_LINE_RE.fullmatch(first_line)
+    if match is None:
+        return None, text.strip()
+    return match.group(1).strip(' *"') or None, rest.strip()
+
+def get_batched_question_prompt(topic: str, concepts: list, difficulty_level: str = "medium") -> str:
+    """One question per concept in a single prompt; only the first MAX_BATCHED_QUESTIONS concepts are used"""
+    questions_block = "\n".join(
+        f"[Q{i}] concept: {concept}" for i, concept in enumerate(concepts[:MAX_BATCHED_QUESTIONS], 1)
+    )
+    return _render("batched_question", {
+        "topic": topic,
+        "difficulty_level": difficulty_level,
+        "questions_block": questions_block
+    })
+
+def parse_batched_questions(text: str, count: int) -> List[str]:
+    """Map [A1]..[An] labelled answers back to question order; missing answers are empty strings"""
+    answers = {int(index): body.strip() for index, body in _ANSWER_LABEL_RE.findall(text)}
+    return [answers.get(i, "") for i in range(1, count + 1)]
+
+def get_multi_topic_kickoff_prompt(topics: List[Tuple[str, str]]) -> str:
+    """Kick-offs for several (topic, topic_content) pairs in one prompt; only the first MAX_BATCHED_KICKOFFS are used"""
+    topics_block = "\n\n".join(
+        f"[TOPIC_{i}] {topic}\nAvailable content:\n{topic_content}"
+        for i, (topic, topic_content) in enumerate(topics[:MAX_BATCHED_KICKOFFS], 1)
+    )
+    return _render("multi_topic_kickoff", {"topics_block": topics_block})
+
+def parse_multi_topic_kickoffs(text: str, count: int) -> List[str]:
+    """Map [OUT_1]..[OUT_n] sections back to topic order; missing sections are empty strings"""
+    outputs = {int(index): body.strip() for index, body in _OUT_LABEL_RE.findall(text)}
+    return [outputs.get(i, "") for i in range(1, count + 1)]
+
+class RevisionPrompts:
+    """Centralized prompts for revision system; kept as a namespace over the module-level functions"""
+    get_topic_kickoff_prompt = staticmethod(get_topic_kickoff_prompt)
+    get_progressive_recap_prompt = staticmethod(get_progressive_recap_prompt)
+    get_engaging_question_prompt = staticmethod(get_engaging_question_prompt)
+    get_mini_quiz_prompt = staticmethod(get_mini_quiz_prompt)
+    get_feedback_prompt = staticmethod(get_feedback_prompt)
+    get_progress_tracking_prompt = staticmethod(get_progress_tracking_prompt)
+    get_conclusion_prompt = staticmethod(get_conclusion_prompt)
+    get_question_handling_prompt = staticmethod(get_question_handling_prompt)
+    get_quiz_feedback_prompt = staticmethod(get_quiz_feedback_prompt)
+    get_session_opener_prompt = staticmethod(get_session_opener_prompt)
+    parse_session_opener = staticmethod(parse_session_opener)
+    parse_concept_line = staticmethod(parse_concept_line)
+    get_batched_question_prompt = staticmethod(get_batched_question_prompt)
+    parse_batched_questions = staticmethod(parse_batched_questions)
+    get_multi_topic_kickoff_prompt = staticmethod(get_multi_topic_kickoff_prompt)
+    parse_multi_topic_kickoffs = staticmethod(parse_multi_topic_kickoffs)
\ No newline at end of file